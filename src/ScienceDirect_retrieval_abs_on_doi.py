@@ -1,25 +1,30 @@
-import requests
+import httpx
+import asyncio
 import json
 import itertools
-import time
+from aiolimiter import AsyncLimiter
 from api_keys import api_key_sciencedirect
 
 # Fetches results from ScienceDirect Metadata API based on specified DOIs
 # This script retrieves detailed metadata including abstracts for articles
 # Then merges this metadata with previously fetched results
 # and saves the enriched results to a new JSON file
+# Requests run concurrently via httpx.AsyncClient; an AsyncLimiter keeps us
+# inside the Elsevier quota (6 requests per second) instead of sleeping serially
 
 
 # Config
 API_KEY = api_key_sciencedirect
 API_URL = "https://api.elsevier.com/content/metadata/article"
 
-INPUT_FILE = "combined_results.json"
-OUTPUT_FILE = "merged_with_metadata.json"
+INPUT_FILE = "combined_results.ndjson"
+OUTPUT_FILE = "merged_with_metadata.ndjson"
 LOG_FILE = "doi_metadata_log.txt"
 
-SLEEP_BASE = 0.8  # Sekunden warten zwischen Anfragen
-MAX_RETRIES = 3   # Bei Netzwerkfehlern
+MAX_RETRIES = 3        # Bei Netzwerkfehlern
+RATE_LIMIT = 6         # Elsevier-Quota: 6 Requests pro Sekunde
+MAX_IN_FLIGHT = 10     # Gleichzeitig offene Requests
+BATCH_SIZE = 25        # DOIs pro Request (boolesche OR-Query)
 
 # Wichtige Felder (Abstract = description)
 FIELDS = "identifier,title,description,author,publicationName,coverDate,openAccess,link"
@@ -29,71 +34,124 @@ HEADERS = {
     "X-ELS-APIKey": API_KEY
 }
 
+# Konstante Query-Parameter einmalig definieren; pro Batch variiert nur die
+# Query. Die Parameter laufen über params=, damit httpx Sonderzeichen in DOIs
+# (z.B. # oder &) korrekt percent-encodiert statt die URL zu zerschneiden
+BASE_PARAMS = {"field": FIELDS, "count": str(BATCH_SIZE)}
+
 # ---- FUNCTIONS ----
-def get_metadata_by_doi(doi):
-    url = f"{API_URL}?query=doi({doi})&field={FIELDS}"
+def chunked(iterable, size):
+    it = iter(iterable)
+    while chunk := list(itertools.islice(it, size)):
+        yield chunk
+
+
+async def get_metadata_by_dois(chunk, client, sem, limiter):
+    # Eine boolesche OR-Query pro Batch statt eines Requests pro DOI
+    query = " OR ".join(f"doi({d})" for d in chunk)
+    params = {"query": query, **BASE_PARAMS}
     retries = 0
-    while retries < MAX_RETRIES:
-        resp = requests.get(url, headers=HEADERS)
-        if resp.status_code == 200:
-            return resp.json()
-        elif resp.status_code == 429:  # Rate-Limit
-            retry_after = int(resp.headers.get("Retry-After", 30))
-            print(f"Rate limit hit. Waiting {retry_after}s...")
-            time.sleep(retry_after)
-        else:
-            print(f"Error {resp.status_code} for DOI {doi}: {resp.text}")
-            break
-        retries += 1
+    async with sem:
+        while retries < MAX_RETRIES:
+            await limiter.acquire()
+            try:
+                resp = await client.get(API_URL, headers=HEADERS, params=params)
+            except httpx.HTTPError as e:
+                # Netzwerkfehler nur diesen Batch kosten lassen statt über
+                # asyncio.gather den kompletten Lauf abzubrechen
+                retries += 1
+                print(f"Network error for batch of {len(chunk)} DOIs: {e}. "
+                      f"Retry {retries}/{MAX_RETRIES}...")
+                await asyncio.sleep(2 ** retries)
+                continue
+            if resp.status_code == 200:
+                return resp.json()
+            elif resp.status_code == 429:  # Rate-Limit
+                retry_after = int(resp.headers.get("Retry-After", 30))
+                print(f"Rate limit hit. Waiting {retry_after}s...")
+                await asyncio.sleep(retry_after)
+            else:
+                # Nur die ersten 500 Bytes dekodieren statt den kompletten Body
+                print(f"Error {resp.status_code} for batch of {len(chunk)} DOIs: "
+                      f"{resp.content[:500].decode('utf-8', errors='replace')}")
+                break
+            retries += 1
     return None
 
+
+async def fetch_all(dois):
+    # Ergebnisse als Dict keyed by DOI, damit die Reihenfolge erhalten bleibt
+    sem = asyncio.Semaphore(MAX_IN_FLIGHT)
+    limiter = AsyncLimiter(RATE_LIMIT, 1)
+    chunks = list(chunked(dois, BATCH_SIZE))
+    # Ein einziger Client für alle Requests: Keep-Alive-Verbindungen werden
+    # wiederverwendet, HTTP/2 multiplext die parallelen Requests über eine
+    # TCP-Verbindung
+    async with httpx.AsyncClient(http2=True, timeout=30) as client:
+        tasks = [get_metadata_by_dois(chunk, client, sem, limiter) for chunk in chunks]
+        responses = await asyncio.gather(*tasks)
+
+    # Antworten wieder per DOI aufschlüsseln (prism:doi der Treffer).
+    # DOIs aus fehlgeschlagenen Batches werden separat gesammelt, damit sie
+    # im Log als FAILED (erneut versuchen) statt NO_METADATA auftauchen
+    entries_by_doi = {}
+    failed_dois = set()
+    for chunk, metadata in zip(chunks, responses):
+        if not metadata or "search-results" not in metadata:
+            failed_dois.update(chunk)
+            continue
+        for entry in metadata["search-results"].get("entry", []):
+            entry_doi = entry.get("prism:doi")
+            if entry_doi:
+                entries_by_doi[entry_doi] = entry
+    return entries_by_doi, failed_dois
+
 # ---- MAIN LOGIC ----
-# 1. Lade ursprüngliche Ergebnisse
+# 1. Lade ursprüngliche Ergebnisse (NDJSON: ein Record pro Zeile)
 with open(INPUT_FILE, "r", encoding="utf-8") as f:
-    original_data = json.load(f)
+    original_data = [json.loads(line) for line in f if line.strip()]
 
-# 2. DOIs extrahieren
-dois = list({item.get("doi") for item in original_data if item.get("doi")})
+# 2. DOIs extrahieren und Originaldaten einmalig per DOI indexieren
+# (ein Durchlauf, ein .get pro Record; das Dict dedupliziert gleich mit)
+by_doi = {doi: item for item in original_data if (doi := item.get("doi"))}
+dois = list(by_doi)
 print(f"Found {len(dois)} unique DOIs.")
 
-merged_results = []
+# 3. Metadaten parallel und gebatcht abrufen
+entries_by_doi, failed_dois = asyncio.run(fetch_all(dois))
+
+merged_count = 0
 log_entries = []
 
-for i, doi in enumerate(dois, start=1):
-    print(f"\n[{i}/{len(dois)}] Fetching metadata for DOI: {doi}")
-    metadata = get_metadata_by_doi(doi)
-    
-    if metadata and "search-results" in metadata:
-        entries = metadata["search-results"].get("entry", [])
-        if entries:
-            enriched_entry = entries[0]  # Normalerweise 1 Treffer pro DOI
-            
-            # Finde Originaldatensatz
-            original_entry = next((x for x in original_data if x.get("doi") == doi), None)
-            
+# 4. Mergen und direkt als NDJSON streamen statt am Ende die komplette Liste
+# zu serialisieren
+with open(OUTPUT_FILE, "w", encoding="utf-8") as out_f:
+    for i, doi in enumerate(dois, start=1):
+        print(f"\n[{i}/{len(dois)}] Processing metadata for DOI: {doi}")
+        enriched_entry = entries_by_doi.get(doi)
+
+        if enriched_entry:
+            # Finde Originaldatensatz (O(1) Dict-Lookup statt linearem Scan)
+            original_entry = by_doi.get(doi)
+
             # Merge beide Dicts
             combined = {
                 "doi": doi,
                 "original": original_entry,
                 "metadata": enriched_entry
             }
-            merged_results.append(combined)
+            out_f.write(json.dumps(combined, ensure_ascii=False) + "\n")
+            merged_count += 1
             log_entries.append(f"{doi}: SUCCESS")
+        elif doi in failed_dois:
+            print(f"Request failed for DOI: {doi}")
+            log_entries.append(f"{doi}: FAILED")
         else:
             print(f"No metadata found for DOI: {doi}")
             log_entries.append(f"{doi}: NO_METADATA")
-    else:
-        print(f"Failed to retrieve metadata for DOI: {doi}")
-        log_entries.append(f"{doi}: FAILED")
-    
-    time.sleep(SLEEP_BASE)
-
-# 3. Speichern
-with open(OUTPUT_FILE, "w", encoding="utf-8") as f:
-    json.dump(merged_results, f, indent=2)
 
 with open(LOG_FILE, "w", encoding="utf-8") as f:
     f.write("\n".join(log_entries))
 
-print(f"\n✅ Done! {len(merged_results)} merged records saved to {OUTPUT_FILE}")
-print(f"Log written to {LOG_FILE}")
\ No newline at end of file
+print(f"\n✅ Done! {merged_count} merged records saved to {OUTPUT_FILE}")
+print(f"Log written to {LOG_FILE}")
@@ -1,8 +1,12 @@
 import requests
+import requests_cache
 import json
 import itertools
+import random
 import time
 import os
+from pathlib import Path
+from doi_dedup import load_seen_dois, save_seen_dois
 
 # Fetches results from ScienceDirect API based on specified search terms
 # This script combines results from multiple queries to avoid API limits and deduplicates by DOI
@@ -13,20 +17,44 @@ import os
 API_KEY = os.getenv("API_KEY_SCIENDEDIRECT")
 API_URL = "https://api.elsevier.com/content/search/sciencedirect"
 
+# Cache mit ETag/Last-Modified Unterstützung: bei unveränderten Antworten
+# liefert der Server 304 ohne Body und ohne Quota-Kosten. always_revalidate,
+# weil die API kein Cache-Control sendet und Einträge sonst nie ablaufen —
+# Wiederholungsläufe würden ewig alte Suchseiten aus dem Cache abspielen
+session = requests_cache.CachedSession(
+    "api_cache.sqlite",
+    cache_control=True,
+    always_revalidate=True,
+    allowable_codes=(200, 304),
+    allowable_methods=("GET", "PUT"),
+)
+
 SHOW = 25  # Treffer pro Seite: 10, 25, 50, 100
 MAX_RESULTS_PER_QUERY = 500  # Safety-Limit pro Query, um API-Quota zu schützen
 SLEEP_BASE = 0.7  # Sekunden warten, um Rate-Limits zu vermeiden (2 Requests pro Sekunde erlaubt)
-OUTPUT_FILE = "combined_results.json"
+MAX_RETRIES = 4  # Versuche bei Netzwerkfehlern und 5xx-Antworten
+OUTPUT_FILE = "combined_results.ndjson"
 
 HEADERS = {
     "Accept": "application/json",
     "X-ELS-APIKey": API_KEY
 }
 
-# Create results directory if it doesn't exist
+# Create results directory if it doesn't exist (ein mkdir mit exist_ok
+# statt des racy exists-then-makedirs Zweischritts)
 results_dir = "results"
-if not os.path.exists(results_dir):
-    os.makedirs(results_dir)
+Path(results_dir).mkdir(parents=True, exist_ok=True)
+
+# Queries, die schon einmal 0 Treffer geliefert haben, werden persistiert und
+# bei Wiederholungsläufen ohne API-Call übersprungen; das dünnt den
+# A x B x C Query-Raum bei jedem Lauf weiter aus
+EMPTY_QUERIES_FILE = os.path.join(results_dir, "empty_queries.json")
+
+known_empty = set()
+if os.path.exists(EMPTY_QUERIES_FILE):
+    with open(EMPTY_QUERIES_FILE, "r", encoding="utf-8") as f:
+        known_empty = set(json.load(f))
+    print(f"Loaded {len(known_empty)} known-empty queries; they will be skipped.")
 
 # ---- Search String GROUPS ----
 group_A = [
@@ -61,34 +89,74 @@ group_C = [
 # ---- FUNCTIONS ----
 def make_request(query, offset=0, show=SHOW):
     payload = {"qs": query, "offset": offset, "show": show}
-    try:
-        response = requests.put(API_URL, headers=HEADERS, data=json.dumps(payload))
-    except requests.RequestException as e:
-        print(f"Network error: {e}")
-        return None
-
-    if response.status_code == 200:
-        return response.json()
-    elif response.status_code == 429:  # Rate limit
-        retry_after = int(response.headers.get("Retry-After", 30))
-        print(f"Rate limit reached. Waiting {retry_after} seconds...")
-        time.sleep(retry_after)
-        return make_request(query, offset, show)
-    else:
-        print(f"Error {response.status_code}: {response.text}")
-        return None
+
+    for attempt in range(MAX_RETRIES):
+        # Exponentielles Backoff mit Jitter statt fester Wartezeit; der Jitter
+        # verhindert, dass wiederholte Versuche synchron auf die API treffen
+        backoff = SLEEP_BASE * (2 ** attempt) + random.uniform(0, SLEEP_BASE)
+
+        try:
+            response = session.put(API_URL, headers=HEADERS, data=json.dumps(payload))
+        except requests.RequestException as e:
+            print(f"Network error: {e}. Retrying in {backoff:.2f}s...")
+            time.sleep(backoff)
+            continue
+
+        if response.status_code == 200:
+            return response.json()
+        elif response.status_code == 429:  # Rate limit
+            retry_after = int(response.headers.get("Retry-After", 30))
+            print(f"Rate limit reached. Waiting {retry_after} seconds...")
+            time.sleep(retry_after + random.uniform(0, SLEEP_BASE))
+        elif response.status_code >= 500:
+            print(f"Server error {response.status_code}. Retrying in {backoff:.2f}s...")
+            time.sleep(backoff)
+        else:
+            # Nur die ersten 500 Bytes dekodieren statt den kompletten Body
+            print(f"Error {response.status_code}: {response.content[:500].decode('utf-8', errors='replace')}")
+            return None
+
+    print(f"Giving up after {MAX_RETRIES} attempts for offset {offset}.")
+    return None
+
+
+def write_result(item):
+    # Die Ausgabedatei wird erst beim ersten Treffer geöffnet (und damit
+    # geleert); ein Lauf, der komplett fehlschlägt, lässt die Ergebnisse
+    # des letzten Laufs unangetastet
+    global results_f
+    if results_f is None:
+        results_f = open(all_results_file, "w", encoding="utf-8")
+    results_f.write(json.dumps(item, ensure_ascii=False) + "\n")
 
 # ---- MAIN LOGIC ----
-all_results = []
-seen_dois = set()
-total_queries = len(group_A) * len(group_B) * len(group_C)
+# Ergebnisse werden als NDJSON gestreamt (eine Zeile pro Record) statt am Ende
+# als komplette Liste serialisiert zu werden; so bleibt der Speicherbedarf
+# konstant und ein Abbruch verliert keine bereits geholten Records
+all_results_file = os.path.join(results_dir, OUTPUT_FILE)
+results_f = None  # lazily geöffnet durch write_result
+total_unique = 0
+
+# Bloom-Filter pro Korpus: DOIs, die der Springer-Crawl schon gesammelt hat,
+# werden hier direkt als Duplikat verworfen (und umgekehrt). Nur die Filter
+# der anderen Korpora werden gelesen, damit ein Wiederholungslauf die eigenen
+# Records vom letzten Mal nicht als Duplikate verwirft
+seen_dois = load_seen_dois("sciencedirect")
 processed_queries = 0
 empty_streak = 0
 
-for a, b, c in itertools.product(group_A, group_B, group_C):
+# Query-Raum einmalig materialisieren statt den Produkt-Iterator implizit
+# aufzubauen; bekannte leere Zellen werden vorab herausgefiltert
+query_space = [
+    f"\"{a}\" AND \"{b}\" AND \"{c}\""
+    for a, b, c in itertools.product(group_A, group_B, group_C)
+]
+queries = [q for q in query_space if q not in known_empty]
+print(f"Query space: {len(query_space)} cells, {len(queries)} after pruning known-empty ones.")
+
+for query in queries:
     processed_queries += 1
-    query = f"\"{a}\" AND \"{b}\" AND \"{c}\""
-    print(f"\n[{processed_queries}/{total_queries}] Query: {query}")
+    print(f"\n[{processed_queries}/{len(queries)}] Query: {query}")
 
     # --- 1. Vorprüfung: Nur 1 Ergebnis holen ---
     check = make_request(query, offset=0, show=1)
@@ -100,6 +168,7 @@ for a, b, c in itertools.product(group_A, group_B, group_C):
     print(f"Total results: {total_results}")
 
     if total_results == 0:
+        known_empty.add(query)
         empty_streak += 1
         # Adaptive Sleep bei mehreren leeren Treffern
         time.sleep(SLEEP_BASE * empty_streak)
@@ -117,7 +186,8 @@ for a, b, c in itertools.product(group_A, group_B, group_C):
         doi = item.get("doi")
         if doi and doi not in seen_dois:
             seen_dois.add(doi)
-            all_results.append(item)
+            write_result(item)
+            total_unique += 1
 
     # --- 3. Pagination ---
     offset = SHOW
@@ -129,7 +199,8 @@ for a, b, c in itertools.product(group_A, group_B, group_C):
             doi = item.get("doi")
             if doi and doi not in seen_dois:
                 seen_dois.add(doi)
-                all_results.append(item)
+                write_result(item)
+                total_unique += 1
         offset += SHOW
         print(f"Fetched {offset}/{min(total_results, MAX_RESULTS_PER_QUERY)} for this query...")
         time.sleep(SLEEP_BASE)  # Standardpause pro Page
@@ -137,11 +208,16 @@ for a, b, c in itertools.product(group_A, group_B, group_C):
     # Kleine Pause zwischen Queries
     time.sleep(SLEEP_BASE)
 
-print(f"\n✅ Finished. Total unique results: {len(all_results)}")
+if results_f is not None:
+    results_f.close()
 
-# ---- SAVE RESULTS ----
-all_results_file = os.path.join(results_dir, OUTPUT_FILE)
-with open(all_results_file, "w", encoding="utf-8") as f:
-    json.dump(all_results, f, indent=2)
+# Leere Zellen des Query-Raums für den nächsten Lauf persistieren
+with open(EMPTY_QUERIES_FILE, "w", encoding="utf-8") as f:
+    json.dump(sorted(known_empty), f, indent=2)
+
+# Gesehene DOIs für die anderen Retrieval-Skripte persistieren
+save_seen_dois(seen_dois)
 
-print(f"Results saved to {all_results_file}")
\ No newline at end of file
+print(f"\n✅ Finished. Total unique results: {total_unique}")
+print(f"Results saved to {all_results_file}")
+print(f"{len(known_empty)} empty queries recorded in {EMPTY_QUERIES_FILE}")
\ No newline at end of file
@@ -2,21 +2,27 @@
 Springer API Processing Script - Processes and filters data retrieved by Springer_retrieval.py
 This script reads the JSON file generated by Springer_retrieval.py, processes the data,
 filters it based on specific criteria, and saves the results in a structured CSV format.
+Records are processed in batches through a generator and appended lazily to the
+CSV, so memory stays bounded regardless of the crawl size.
 """
 import sys
 import os
+import re
 import pandas as pd
 import numpy as np
-import json
+import orjson
 import csv
+from collections import Counter
+from itertools import islice
 from datetime import datetime
-from pandas import json_normalize  # Updated import statement
+from pathlib import Path
 import logging
+from logging.handlers import RotatingFileHandler
 
-# Setup logging
+# Setup logging; a single mkdir with exist_ok instead of the racy
+# exists-then-makedirs two-step
 log_dir = "logs"
-if not os.path.exists(log_dir):
-    os.makedirs(log_dir)
+Path(log_dir).mkdir(parents=True, exist_ok=True)
 log_filename = os.path.join(
     log_dir, datetime.now().strftime("logs_springer_retrieval_%Y-%m-%d_%H-%M-%S.txt")
 )
@@ -24,119 +30,240 @@ logging.basicConfig(
     level=logging.INFO,
     format="%(asctime)s [%(levelname)s] %(message)s",
     handlers=[
-        logging.FileHandler(log_filename, encoding="utf-8"),
+        # delay=True: the log file is only created once something is logged
+        RotatingFileHandler(log_filename, maxBytes=5 * 1024 * 1024, backupCount=3,
+                            encoding="utf-8", delay=True),
         logging.StreamHandler(sys.stdout)
     ]
 )
 logger = logging.getLogger(__name__)
 
+# Filter criteria; the review pattern is compiled once at import instead of
+# per run inside the processing block
+valid_ct = ['Article']
+review_pattern = re.compile(r'^review', re.IGNORECASE)
+
+# Translation table mapping CSV-problematic whitespace to plain spaces
+whitespace_table = str.maketrans({'\r': ' ', '\n': ' ', '\t': ' '})
+
+# Top-level record fields the pipeline actually uses; everything else in the
+# raw records is ignored, so there is no need to normalize nested structures
+used_fields = [
+    'contentType', 'genre', 'language', 'publicationDate',
+    'title', 'creators', 'abstract', 'keyword', 'publisher',
+    'publicationType', 'openaccess', 'startingPage', 'endingPage',
+    'doi', 'url'
+]
+
+# Select and rename columns of interest
+columns_mapping = {
+    'title': 'title',
+    'creators': 'author',
+    'abstract': 'abstract',
+    'keyword': 'keywords',
+    'publisher': 'publisher',
+    'publicationDate': 'publicationDate',
+    'language': 'language',
+    'publicationType': 'publicationType',
+    'openaccess': 'openaccess',
+    'startingPage': 'starting_page',
+    'endingPage': 'ending_page',
+    'doi': 'doi',
+    'url': 'urls'
+}
+
+# Column order for the final output (no cited_by column)
+final_columns = [
+    'doi', 'title', 'author', 'abstract', 'keywords',
+    'publisher', 'publicationDate', 'publicationType', 'pdf_link'
+]
+
+# Number of records per processing batch
+BATCH_SIZE = 1000
+
 # Paths
 results_dir = "results"
-input_file = os.path.join(results_dir, "springer_all_results.json")
+input_file = os.path.join(results_dir, "springer_all_results.jsonl")
+parquet_file = os.path.join(results_dir, "springer_all_results.parquet")
 output_file = os.path.join(results_dir, "results_springer_v2.csv")
 
-# Check if the input file exists
-if not os.path.exists(input_file):
-    logger.error(f"Error: Input file '{input_file}' not found.")
-    logger.error("Please run Springer_retrieval.py first to retrieve data.")
-    sys.exit(1)
-
-logger.info(f"Processing Springer results from {input_file}")
-
-# Load the retrieved data
-with open(input_file, 'r', encoding='utf-8') as f:
-    search_results = json.load(f)
-
-# Process the retrieved publications
-if search_results:
-    logger.info(f"Processing {len(search_results)} publications...")
-    
-    # Analyze the content types before filtering
-    content_types = {}
-    for record in search_results:
-        content_type = record.get('contentType', 'Unknown')
-        if content_type in content_types:
-            content_types[content_type] += 1
-        else:
-            content_types[content_type] = 1
-    
-    logger.info("\nContent Types before filtering:")
-    for ctype, count in sorted(content_types.items(), key=lambda x: x[1], reverse=True):
-        logger.info(f"  {ctype}: {count} records ({count/len(search_results)*100:.1f}%)")
-    
-    # Filter records based on manual search criteria from the URL
-    # URL: https://link.springer.com/search?new-search=true&query=...&content-type=Article&content-type=Research&content-type=Conference+Paper&content-type=Review&date=custom&dateFrom=2016&dateTo=&sortBy=relevance
-    
-    import re
-    valid_ct = ['Article']
-    review_pattern = re.compile(r'^review', re.IGNORECASE)
-
-    def is_conference(ct):
-        return ct.endswith('ConferencePaper')
-
-    def is_review(genres):
-        if isinstance(genres, str):
-            genres = [genres]
-        return any(review_pattern.match(str(g)) for g in genres)
-
-    filtered_results = []
-    for rec in search_results:
-        ct = rec.get('contentType', '')
-        genres = rec.get('genre', [])
-        lang = rec.get('language', '')
-        pub_date = rec.get('publicationDate', '')
-        year = pub_date[:4] if pub_date else ''
-        if (ct in valid_ct or is_conference(ct) or is_review(genres)) \
-           and lang == 'en' \
-           and year >= '2016':
-            filtered_results.append(rec)
-    logger.info(f"\nFiltered from {len(search_results)} to {len(filtered_results)} records")
-    logger.info(f"Filtering removed {len(search_results) - len(filtered_results)} records")
-    
-    # Analyze the content types after filtering
-    filtered_content_types = {}
-    for record in filtered_results:
-        content_type = record.get('contentType', 'Unknown')
-        if content_type in filtered_content_types:
-            filtered_content_types[content_type] += 1
-        else:
-            filtered_content_types[content_type] = 1
-    
-    logger.info("\nContent Types after filtering:")
-    for ctype, count in sorted(filtered_content_types.items(), key=lambda x: x[1], reverse=True):
-        logger.info(f"  {ctype}: {count} records ({count/len(filtered_results)*100:.1f}%)")
-    
-    # Convert to DataFrame using json_normalize
-    df = json_normalize(filtered_results)
-    
-    # Show sample of DataFrame structure
-    logger.info("\nDataFrame columns:")
-    for col in df.columns:
-        logger.info(f"  {col}")
-    
-    # Select and rename columns of interest
-    columns_mapping = {
-        'title': 'title',
-        'creators': 'author',
-        'abstract': 'abstract',
-        'keyword': 'keywords',
-        'publisher': 'publisher',
-        'publicationDate': 'publicationDate',
-        'language': 'language',
-        'publicationType': 'publicationType',
-        'openaccess': 'openaccess',
-        'startingPage': 'starting_page',
-        'endingPage': 'ending_page',
-        'doi': 'doi',
-        'url': 'urls'
-    }
-    
+
+def read_records(path):
+    """Lazily yield records from the JSON Lines file, one line at a time."""
+    with open(path, 'rb') as f:
+        for line in f:
+            if line.strip():
+                yield orjson.loads(line)
+
+
+def read_parquet_batches(path):
+    """Return an iterator of record-dict batches from the columnar copy.
+
+    Only the top-level fields the pipeline uses are decoded; the other
+    columns never leave the file. The file is opened eagerly so a corrupt
+    or truncated parquet raises here, where the caller can fall back to
+    the JSON Lines input, instead of mid-iteration.
+    """
+    import pyarrow.parquet as pq
+
+    pf = pq.ParquetFile(path)
+    columns = [c for c in used_fields if c in pf.schema_arrow.names]
+
+    def batches():
+        for batch in pf.iter_batches(batch_size=BATCH_SIZE, columns=columns):
+            yield batch.to_pylist()
+
+    return batches()
+
+
+def iter_batches(records, size=BATCH_SIZE):
+    """Yield successive batches from an iterable of records."""
+    it = iter(records)
+    while batch := list(islice(it, size)):
+        yield batch
+
+
+def is_review(genres):
+    if isinstance(genres, str):
+        genres = [genres]
+    if not isinstance(genres, list):
+        return False
+    return any(review_pattern.search(str(g)) for g in genres)
+
+
+# Process authors - handle nested list structures based on Springer API response format
+def process_authors(authors_data):
+    # Handle None, NaN, empty list, or other invalid data
+    if authors_data is None or (isinstance(authors_data, (list, tuple)) and len(authors_data) == 0):
+        return "No author information"
+
+    # Special handling for pandas NA values or numpy arrays
+    try:
+        if pd.isna(authors_data).all():
+            return "No author information"
+    except (TypeError, ValueError, AttributeError):
+        # If it's not a pandas or numpy object that supports isna().all()
+        pass
+
+    authors = []
+    # Make sure we're working with a list
+    author_list = authors_data if isinstance(authors_data, list) else [authors_data]
+
+    for author in author_list:
+        if isinstance(author, dict):
+            # Extract creator information (always present)
+            if 'creator' in author:
+                authors.append(author['creator'])
+
+    return " / ".join(authors) if authors else "No author information"
+
+
+# Process keywords - handle nested list structures
+def process_keywords(keywords_data):
+    # Handle None, NaN, or empty values
+    if keywords_data is None or (isinstance(keywords_data, (list, tuple)) and len(keywords_data) == 0):
+        return "No keywords"
+
+    # Special handling for pandas NA values or numpy arrays
+    try:
+        if pd.isna(keywords_data).all():
+            return "No keywords"
+    except (TypeError, ValueError, AttributeError):
+        # If it's not a pandas or numpy object that supports isna().all()
+        pass
+
+    if isinstance(keywords_data, list):
+        # Filter out None or NaN values before joining
+        valid_keywords = [str(keyword) for keyword in keywords_data if keyword is not None and not (hasattr(keyword, 'is_na') and keyword.is_na())]
+        return " / ".join(valid_keywords) if valid_keywords else "No keywords"
+    else:
+        # Handle single values
+        try:
+            return str(keywords_data) if not pd.isna(keywords_data) else "No keywords"
+        except (TypeError, ValueError):
+            return str(keywords_data) if keywords_data is not None else "No keywords"
+
+
+# Process URLs to extract PDF link based on Springer API response format
+def extract_pdf_link(urls_data):
+    # Handle None, NaN, or empty values
+    if urls_data is None or (isinstance(urls_data, (list, tuple)) and len(urls_data) == 0):
+        return "No PDF link"
+
+    # Special handling for pandas NA values or numpy arrays
+    try:
+        if pd.isna(urls_data).all():
+            return "No PDF link"
+    except (TypeError, ValueError, AttributeError):
+        # If it's not a pandas or numpy object that supports isna().all()
+        pass
+
+    if isinstance(urls_data, list):
+        # First look for PDF format specifically
+        for url_item in urls_data:
+            if isinstance(url_item, dict) and 'format' in url_item and url_item['format'] == 'pdf':
+                return url_item.get('value', "No PDF link")
+
+        # If no PDF found, try to get DOI link
+        for url_item in urls_data:
+            if isinstance(url_item, dict) and 'value' in url_item and 'doi.org' in url_item['value']:
+                return url_item.get('value', "No PDF link")
+
+        # Fallback to any URL
+        if len(urls_data) > 0 and isinstance(urls_data[0], dict):
+            return urls_data[0].get('value', "No PDF link")
+
+    # If it's a string (already a URL), return it
+    elif isinstance(urls_data, str):
+        return urls_data
+
+    return "No PDF link"
+
+
+def filter_batch(df_all):
+    """Apply the content-type / language / year criteria as boolean masks."""
+
+    def column(name, default=''):
+        if name in df_all.columns:
+            return df_all[name].fillna(default)
+        return pd.Series(default, index=df_all.index)
+
+    # Boolean masks instead of a per-record Python loop; only the list-valued
+    # genre column still needs a Python-level apply
+    ct = column('contentType')
+    ct_mask = ct.isin(valid_ct) | ct.str.endswith('ConferencePaper')
+    if 'genre' in df_all.columns:
+        ct_mask |= df_all['genre'].apply(is_review)
+    lang_mask = column('language') == 'en'
+    year_mask = column('publicationDate').str[:4] >= '2016'
+
+    return df_all[ct_mask & lang_mask & year_mask].reset_index(drop=True)
+
+
+def process_batch(batch):
+    """Filter one batch of raw records and shape it into the output columns."""
+    # Extract only the used top-level fields directly into columns; this skips
+    # json_normalize's recursive flattening of nested author/url structures,
+    # which the processing steps below handle themselves
+    df_all = pd.DataFrame({
+        field: [rec.get(field) for rec in batch]
+        for field in used_fields
+    })
+
+    df = filter_batch(df_all)
+
+    # Content-type breakdowns for this batch, accumulated by the caller
+    ct_before = df_all['contentType'].fillna('Unknown').value_counts().to_dict()
+    ct_after = df['contentType'].fillna('Unknown').value_counts().to_dict()
+
     # Create a new DataFrame with only the columns we need
     results = pd.DataFrame()
-    
+
     # Process each column, handling missing values and nested structures
     for src_col, target_col in columns_mapping.items():
-        if src_col in df.columns:
+        # Columns always exist after direct extraction, but a field missing
+        # from every record still gets the default fill below
+        if src_col in df.columns and df[src_col].notna().any():
             results[target_col] = df[src_col]
         else:
             # Fill with appropriate default values based on column type
@@ -148,154 +275,171 @@ if search_results:
                 results[target_col] = None
             else:
                 results[target_col] = None
-    
-    # Process authors - handle nested list structures based on Springer API response format
-    def process_authors(authors_data):
-        # Handle None, NaN, empty list, or other invalid data
-        if authors_data is None or (isinstance(authors_data, (list, tuple)) and len(authors_data) == 0):
-            return "No author information"
-        
-        # Special handling for pandas NA values or numpy arrays
-        try:
-            if pd.isna(authors_data).all():
-                return "No author information"
-        except (TypeError, ValueError, AttributeError):
-            # If it's not a pandas or numpy object that supports isna().all()
-            pass
-        
-        authors = []
-        # Make sure we're working with a list
-        author_list = authors_data if isinstance(authors_data, list) else [authors_data]
-        
-        for author in author_list:
-            if isinstance(author, dict):
-                # Extract creator information (always present)
-                if 'creator' in author:
-                    authors.append(author['creator'])
-                    
-        return " / ".join(authors) if authors else "No author information"
-    
+
+    # Low-cardinality columns as categoricals: one small integer code per row
+    # plus a shared value table instead of a Python string object per cell
+    for cat_col in ['language', 'publicationType', 'publisher', 'openaccess']:
+        if cat_col in results.columns:
+            results[cat_col] = results[cat_col].astype('category')
+
     # Apply author processing
     if 'author' in results.columns:
         # Convert to Python native objects before processing to avoid pandas/numpy issues
         results['author'] = results['author'].apply(lambda x: process_authors(x))
-    
-    # Process keywords - handle nested list structures
-    def process_keywords(keywords_data):
-        # Handle None, NaN, or empty values
-        if keywords_data is None or (isinstance(keywords_data, (list, tuple)) and len(keywords_data) == 0):
-            return "No keywords"
-        
-        # Special handling for pandas NA values or numpy arrays
-        try:
-            if pd.isna(keywords_data).all():
-                return "No keywords"
-        except (TypeError, ValueError, AttributeError):
-            # If it's not a pandas or numpy object that supports isna().all()
-            pass
-        
-        if isinstance(keywords_data, list):
-            # Filter out None or NaN values before joining
-            valid_keywords = [str(keyword) for keyword in keywords_data if keyword is not None and not (hasattr(keyword, 'is_na') and keyword.is_na())]
-            return " / ".join(valid_keywords) if valid_keywords else "No keywords"
-        else:
-            # Handle single values
-            try:
-                return str(keywords_data) if not pd.isna(keywords_data) else "No keywords"
-            except (TypeError, ValueError):
-                return str(keywords_data) if keywords_data is not None else "No keywords"
-    
+
     # Apply keyword processing
     if 'keywords' in results.columns:
         # Convert to Python native objects before processing
         results['keywords'] = results['keywords'].apply(lambda x: process_keywords(x))
-    
-    # Process URLs to extract PDF link based on Springer API response format
-    def extract_pdf_link(urls_data):
-        # Handle None, NaN, or empty values
-        if urls_data is None or (isinstance(urls_data, (list, tuple)) and len(urls_data) == 0):
-            return "No PDF link"
-        
-        # Special handling for pandas NA values or numpy arrays
-        try:
-            if pd.isna(urls_data).all():
-                return "No PDF link"
-        except (TypeError, ValueError, AttributeError):
-            # If it's not a pandas or numpy object that supports isna().all()
-            pass
-        
-        if isinstance(urls_data, list):
-            # First look for PDF format specifically
-            for url_item in urls_data:
-                if isinstance(url_item, dict) and 'format' in url_item and url_item['format'] == 'pdf':
-                    return url_item.get('value', "No PDF link")
-            
-            # If no PDF found, try to get DOI link
-            for url_item in urls_data:
-                if isinstance(url_item, dict) and 'value' in url_item and 'doi.org' in url_item['value']:
-                    return url_item.get('value', "No PDF link")
-            
-            # Fallback to any URL
-            if len(urls_data) > 0 and isinstance(urls_data[0], dict):
-                return urls_data[0].get('value', "No PDF link")
-        
-        # If it's a string (already a URL), return it
-        elif isinstance(urls_data, str):
-            return urls_data
-        
-        return "No PDF link"
-    
+
     # Apply PDF link extraction
     if 'urls' in results.columns:
         results['pdf_link'] = results['urls'].apply(extract_pdf_link)
         results.drop('urls', axis=1, inplace=True)
     else:
         results['pdf_link'] = "No PDF link"
-    
+
     # Process page numbers
     if 'starting_page' in results.columns and 'ending_page' in results.columns:
         # Convert to numeric, coerce errors to NaN
         results['starting_page'] = pd.to_numeric(results['starting_page'], errors='coerce').fillna(0).astype(int)
         results['ending_page'] = pd.to_numeric(results['ending_page'], errors='coerce').fillna(0).astype(int)
-        
-        # Calculate number of pages
-        results['number_of_pages'] = results.apply(
-            lambda row: max(0, row['ending_page'] - row['starting_page'] + 1) 
-            if row['ending_page'] > 0 else 0, 
-            axis=1
-        )
-    
-    # Reorder columns for the final output (no cited_by column)
-    final_columns = [
-        'doi', 'title', 'author', 'abstract', 'keywords', 
-        'publisher', 'publicationDate', 'publicationType', 'pdf_link'
-    ]
-    
+
+        # Calculate number of pages with vectorized arithmetic instead of a
+        # per-row apply
+        page_span = (results['ending_page'] - results['starting_page'] + 1).clip(lower=0)
+        results['number_of_pages'] = np.where(results['ending_page'] > 0, page_span, 0)
+
     # Create the final DataFrame with selected columns
     results_springer = results[final_columns].copy()
-    
+
     # Clean text fields to prevent CSV issues
     text_columns = ['title', 'abstract', 'author', 'keywords']
     for col in text_columns:
         if col in results_springer.columns:
-            # Replace problematic characters and newlines
-            results_springer[col] = results_springer[col].astype(str).apply(
-                lambda x: x.replace('\r', ' ').replace('\n', ' ').replace('\t', ' ')
+            # Replace problematic characters and newlines in one translate pass
+            results_springer[col] = results_springer[col].astype(str).str.translate(whitespace_table)
+
+    # A uniform string frame keeps the CSV schema identical across batches.
+    # Decay categoricals to object first: fillna('') on a categorical raises
+    # when '' is not among its categories (any batch with a missing publisher)
+    return results_springer.astype(object).fillna('').astype(str), ct_before, ct_after
+
+
+class LazyCsvWriter:
+    """Opens the output CSV on the first batch and appends one batch at a time.
+
+    Uses pyarrow's incremental CSVWriter when available and falls back to
+    pandas to_csv in append mode otherwise.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._pa_writer = None
+        self._file = None
+        self._header_written = False
+        try:
+            import pyarrow as pa
+            import pyarrow.csv as pacsv
+            self._pa = pa
+            self._pacsv = pacsv
+        except ImportError:
+            self._pa = None
+            self._pacsv = None
+
+    def write(self, frame):
+        if frame.empty:
+            return
+        if self._pa is not None:
+            table = self._pa.Table.from_pandas(frame, preserve_index=False)
+            if self._pa_writer is None:
+                self._file = open(self.path, 'wb')
+                self._file.write(b'\xef\xbb\xbf')  # UTF-8 BOM for Excel compatibility
+                self._pa_writer = self._pacsv.CSVWriter(
+                    self._file, table.schema,
+                    write_options=self._pacsv.WriteOptions(quoting_style='all_valid')
+                )
+            self._pa_writer.write_table(table)
+        else:
+            # Use CSV quoting to handle text with commas, quotes, etc.
+            frame.to_csv(
+                self.path,
+                mode='a' if self._header_written else 'w',
+                header=not self._header_written,
+                index=False,
+                encoding='utf-8-sig',  # Use UTF-8 with BOM for Excel compatibility
+                quoting=csv.QUOTE_NONNUMERIC,  # Quote all non-numeric fields
+                escapechar='\\',  # Use backslash as escape character
+                doublequote=True  # Double quotes within fields
             )
-    
-    # Write the dataframe to a CSV file with proper encoding and quoting
-    # Use CSV quoting to handle text with commas, quotes, etc.
-    results_springer.to_csv(
-        output_file, 
-        index=False, 
-        encoding='utf-8-sig',  # Use UTF-8 with BOM for Excel compatibility
-        quoting=csv.QUOTE_NONNUMERIC,  # Quote all non-numeric fields
-        escapechar='\\',  # Use backslash as escape character
-        doublequote=True  # Double quotes within fields
-    )
-    
-    logger.info(f"\nProcessed and filtered {len(results_springer)} publications")
-    logger.info(f"Results saved to {output_file}")
+            self._header_written = True
+
+    def close(self):
+        if self._pa_writer is not None:
+            self._pa_writer.close()
+        if self._file is not None:
+            self._file.close()
+
+
+# Prefer the columnar copy when the retrieval script produced one and pyarrow
+# is available: it decodes faster and only the used columns are read. Either
+# way the input is consumed batch by batch, so the raw corpus is never fully
+# materialized in memory.
+batches = None
+# Only trust a parquet copy at least as new as the JSON Lines source of
+# truth: a failed conversion in the retrieval script leaves last run's
+# parquet behind, which must not shadow a fresh crawl
+if os.path.exists(parquet_file) and (
+        not os.path.exists(input_file)
+        or os.path.getmtime(parquet_file) >= os.path.getmtime(input_file)):
+    try:
+        batches = read_parquet_batches(parquet_file)
+        logger.info("Processing Springer results from %s", parquet_file)
+    except ImportError:
+        pass
+    except Exception as e:
+        logger.warning("Could not read %s (%s); falling back to JSON Lines",
+                       parquet_file, e)
+
+if batches is None:
+    if not os.path.exists(input_file):
+        logger.error("Error: Input file '%s' not found.", input_file)
+        logger.error("Please run Springer_retrieval.py first to retrieve data.")
+        sys.exit(1)
+    logger.info("Processing Springer results from %s", input_file)
+    batches = iter_batches(read_records(input_file))
+
+logger.info("Processing publications in batches of %d...", BATCH_SIZE)
+
+content_types_before = Counter()
+content_types_after = Counter()
+total_records = 0
+total_written = 0
+
+writer = LazyCsvWriter(output_file)
+for batch in batches:
+    frame, ct_before, ct_after = process_batch(batch)
+    content_types_before.update(ct_before)
+    content_types_after.update(ct_after)
+    writer.write(frame)
+    total_records += len(batch)
+    total_written += len(frame)
+writer.close()
+
+if total_records:
+    logger.info("\nContent Types before filtering:")
+    for ctype, count in content_types_before.most_common():
+        logger.info("  %s: %d records (%.1f%%)", ctype, count, count / total_records * 100)
+
+    logger.info("\nFiltered from %d to %d records", total_records, total_written)
+    logger.info("Filtering removed %d records", total_records - total_written)
+
+    logger.info("\nContent Types after filtering:")
+    for ctype, count in content_types_after.most_common():
+        logger.info("  %s: %d records (%.1f%%)", ctype, count, count / max(total_written, 1) * 100)
+
+    logger.info("\nProcessed and filtered %d publications", total_written)
+    logger.info("Results saved to %s", output_file)
 else:
     logger.info("No results to process")
 
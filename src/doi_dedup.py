@@ -0,0 +1,79 @@
+"""
+Shared DOI deduplication across the ScienceDirect and Springer crawls.
+Each corpus persists its own Bloom filter in the results directory. A crawl
+deduplicates within its run via a fresh filter and only consults the persisted
+filters of the *other* corpora, so a rerun that rebuilds its output file from
+scratch does not drop the records it collected last time.
+"""
+import glob
+import os
+from pathlib import Path
+from pybloom_live import ScalableBloomFilter
+
+BLOOM_DIR = "results"
+
+# Bloom filter instead of a set: a few bits per DOI instead of ~100 bytes.
+# The 1e-6 false-positive rate can very occasionally drop a genuine record
+# as a duplicate, which is acceptable for a dedup-by-DOI crawl.
+INITIAL_CAPACITY = 100000
+ERROR_RATE = 1e-6
+
+
+def _bloom_path(corpus):
+    return os.path.join(BLOOM_DIR, f"seen_dois_{corpus}.bloom")
+
+
+class SeenDois:
+    """This run's DOI filter plus a read-only view of the other corpora.
+
+    Membership checks cover the DOIs added during this run and every
+    persisted filter of the other corpora; add() and save_seen_dois() only
+    touch this corpus's own filter.
+    """
+
+    def __init__(self, corpus, others):
+        self.corpus = corpus
+        self.current = ScalableBloomFilter(
+            initial_capacity=INITIAL_CAPACITY, error_rate=ERROR_RATE
+        )
+        self.others = others
+
+    def __contains__(self, doi):
+        return doi in self.current or any(doi in other for other in self.others)
+
+    def add(self, doi):
+        self.current.add(doi)
+
+
+def load_seen_dois(corpus):
+    """Start a fresh filter for this corpus and load the other corpora's."""
+    others = []
+    for path in glob.glob(os.path.join(BLOOM_DIR, "seen_dois_*.bloom")):
+        if path == _bloom_path(corpus):
+            continue
+        with open(path, "rb") as f:
+            others.append(ScalableBloomFilter.fromfile(f))
+    return SeenDois(corpus, others)
+
+
+def save_seen_dois(seen_dois):
+    """Persist this corpus's filter for the other retrieval scripts."""
+    Path(BLOOM_DIR).mkdir(parents=True, exist_ok=True)
+    with open(_bloom_path(seen_dois.corpus), "wb") as f:
+        seen_dois.current.tofile(f)
+
+
+def filter_new(records, seen_dois, key="doi"):
+    """Return only records whose DOI is unseen and mark those DOIs as seen.
+
+    Records without a DOI are kept; they cannot be deduplicated by DOI.
+    """
+    fresh = []
+    for record in records:
+        doi = record.get(key)
+        if doi:
+            if doi in seen_dois:
+                continue
+            seen_dois.add(doi)
+        fresh.append(record)
+    return fresh